@@ -11,6 +11,7 @@ import time    # Required for schedule loop
 from email.message import EmailMessage # Helps create the structure of the email (To, Subject, Body)
 from datetime import datetime     # Used to get and format current time and date
 from dotenv import load_dotenv    # Loads sensitive info (like API keys) from a hidden .env file
+from knowledge_index import KnowledgeIndex   # Offline search over a local copy of Wikipedia abstracts
 
 # Load spaCy's small English NLP model for understanding user input
 nlp = spacy.load("en_core_web_sm")
@@ -22,6 +23,10 @@ API_KEY = os.getenv("TOMORROW_API_KEY")
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
+# Open the offline knowledge index if it has been built (see knowledge_index.py)
+# Set KNOWLEDGE_INDEX in 'id.env' to use an index stored in another folder.
+knowledge = KnowledgeIndex.load(os.getenv("KNOWLEDGE_INDEX", "knowledge_index"))
+
 # Initialize speech engine for text-to-speech
 engine = pyttsx3.init()
 engine.setProperty('rate', 180)  # Set speaking speed  
@@ -74,8 +79,13 @@ def get_weather(city):
     except Exception:
         speak("Couldn’t fetch the weather right now.")
 
-# Function to answer questions using Wikipedia
+# Function to answer questions using the offline index first, then Wikipedia
 def answer_question(query):
+    if knowledge:
+        result = knowledge.answer(query)  # Answers in milliseconds, no internet needed
+        if result:
+            speak(result)
+            return
     try:
         result = wikipedia.summary(query, sentences=2) # Get a brief summary of the topic
         speak(result)
@@ -0,0 +1,520 @@
+# knowledge_index.py
+# Offline knowledge index used by the voice assistant before it goes to Wikipedia.
+# It is an inverted index ranked with BM25, stored on disk and memory-mapped so it
+# opens instantly and answers questions without any network access.
+#
+# Build it from a Wikipedia abstracts dump (enwiki-latest-abstract.xml[.gz]) or
+# from plain text files (one document per line, optionally "title<TAB>text"):
+#
+#   python knowledge_index.py build enwiki-latest-abstract.xml.gz
+#   python knowledge_index.py build notes.txt          # adds to the existing index
+#   python knowledge_index.py query "who invented the telephone"
+#   python knowledge_index.py bench
+#
+# Every build run writes a new "segment" folder, so adding new sources is cheap.
+# If a source that was already indexed changes or disappears, the index is rebuilt.
+
+import os      # Paths, file sizes and modification times
+import re      # Splitting text into words
+import sys     # Exit codes for the command line tool
+import gzip    # Reading compressed Wikipedia dumps
+import json    # Storing the index manifest
+import math    # Logarithm for the BM25 idf
+import mmap    # Memory-mapping the index files for fast startup
+import time    # Measuring query latency in the benchmark
+import heapq   # Picking the best scoring documents
+import shutil  # Removing old and unfinished segments
+import random  # Sampling benchmark queries
+import argparse                      # Command line interface
+import xml.etree.ElementTree as ET   # Streaming through the abstracts dump
+from array import array              # Compact binary storage of numbers
+
+DEFAULT_INDEX_DIR = "knowledge_index"
+MANIFEST = "manifest.json"
+VERSION = 1
+
+# BM25 parameters (standard values)
+K1 = 1.2
+B = 0.75
+
+# Documents kept in memory before a segment is written to disk during a build
+SEGMENT_SIZE = 200000
+
+# Most postings read per query term. Postings are stored best first, so a common
+# word like "first" only scores its strongest documents instead of millions.
+MAX_POSTINGS = 2000
+
+# Common words that carry no meaning for search
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does",
+    "for", "from", "has", "have", "how", "i", "in", "is", "it", "me", "of", "on",
+    "or", "tell", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "whom", "why", "with", "you", "about", "please", "know",
+}
+
+# A word plus an optional "'s", "'re", "'ll"... ending, which is dropped so that
+# "what's" becomes "what" and "einstein's" becomes "einstein"
+WORD_RE = re.compile(r"([a-z0-9]+)(?:['’][a-z]+)?")
+
+
+# Split text into lowercase search terms without stop words
+def tokenize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+# Keep only the first few sentences of a document, like wikipedia.summary does
+def first_sentences(text, count=2):
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    return " ".join(sentences[:count])
+
+
+# Memory-map a file read-only (empty files cannot be mapped, so return empty bytes)
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None, memoryview(b"")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped, memoryview(mapped)
+
+
+# Check whether a flat (doc, tf) postings view contains a document, at C speed
+def _has_doc(postings, doc_id):
+    docs = postings[::2].tobytes()
+    pattern = array(postings.format, [doc_id]).tobytes()
+    size = postings.itemsize
+    pos = docs.find(pattern)
+    while pos != -1 and pos % size:  # Only count hits that line up with a whole number
+        pos = docs.find(pattern, pos + 1)
+    return pos != -1
+
+
+# ---------------------------------------------------------------------------
+# Reading sources
+# ---------------------------------------------------------------------------
+
+# Yield (title, text) pairs from a Wikipedia abstracts dump
+def read_abstracts(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        title = ""
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem  # The <feed> element that holds every <doc>
+                continue
+            if elem.tag == "title":
+                title = (elem.text or "").replace("Wikipedia: ", "", 1).strip()
+            elif elem.tag == "abstract":
+                text = (elem.text or "").strip()
+                if title and text:
+                    yield title, text
+            elif elem.tag == "doc":
+                title = ""
+                root.clear()  # Drop parsed documents so memory stays flat on large dumps
+
+
+# Yield (title, text) pairs from a text file with one document per line
+def read_text(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if "\t" in line:
+                title, text = line.split("\t", 1)
+            else:
+                title, text = "", line
+            yield title.strip(), text.strip()
+
+
+# Pick the right reader based on the file name
+def read_source(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".xml"):
+        return read_abstracts(path)
+    return read_text(path)
+
+
+# ---------------------------------------------------------------------------
+# Writing segments
+# ---------------------------------------------------------------------------
+
+# Collects documents in memory and writes them as one on-disk segment
+class SegmentWriter:
+    def __init__(self, path):
+        self.final_path = path
+        self.path = path + ".tmp"   # Renamed to the final name once fully written
+        self.postings = {}          # term -> array of (doc id, term frequency) pairs
+        self.doc_offsets = array("Q", [0])
+        self.doc_lengths = array("I")
+        self.tokens = 0
+        os.makedirs(self.path)
+        self.documents = open(os.path.join(self.path, "documents.bin"), "wb")
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, title, text):
+        doc_id = len(self.doc_lengths)
+        terms = tokenize(f"{title} {text}")
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, array("I")).extend((doc_id, tf))
+        record = f"{title}\t{text}".encode("utf-8")
+        self.documents.write(record)
+        self.doc_offsets.append(self.doc_offsets[-1] + len(record))
+        self.doc_lengths.append(len(terms))
+        self.tokens += len(terms)
+
+    # Order a term's postings by BM25 impact, strongest first, so search can stop early
+    def _by_impact(self, postings):
+        avg_length = self.tokens / len(self) if self.tokens else 1.0
+        lengths = self.doc_lengths
+        pairs = sorted(zip(postings[::2], postings[1::2]),
+                       key=lambda pair: pair[1] / (pair[1] + K1 * (1 - B + B * lengths[pair[0]] / avg_length)),
+                       reverse=True)
+        return array("I", [value for pair in pairs for value in pair])
+
+    def close(self):
+        self.documents.close()
+        terms = sorted(self.postings)
+        term_offsets = array("Q", [0])       # Where each term starts in terms.bin
+        posting_offsets = array("Q", [0])    # Where each term's postings start
+        with open(os.path.join(self.path, "terms.bin"), "wb") as terms_file, \
+             open(os.path.join(self.path, "postings.bin"), "wb") as postings_file:
+            for term in terms:
+                encoded = term.encode("utf-8")
+                terms_file.write(encoded)
+                term_offsets.append(term_offsets[-1] + len(encoded))
+                postings = self._by_impact(self.postings[term])
+                postings.tofile(postings_file)
+                posting_offsets.append(posting_offsets[-1] + len(postings) // 2)
+        for name, values in (("term_offsets.bin", term_offsets),
+                             ("posting_offsets.bin", posting_offsets),
+                             ("doc_offsets.bin", self.doc_offsets),
+                             ("doc_lengths.bin", self.doc_lengths)):
+            with open(os.path.join(self.path, name), "wb") as f:
+                values.tofile(f)
+        os.rename(self.path, self.final_path)
+        return {"name": os.path.basename(self.final_path), "docs": len(self), "tokens": self.tokens}
+
+
+# Read a manifest, or return an empty one if the index does not exist yet
+def load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"version": VERSION, "segments": [], "sources": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Save the manifest atomically so a crashed build never leaves a broken index
+def save_manifest(index_dir, manifest):
+    path = os.path.join(index_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# Size and modification time identify a version of a source file
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+# Remove segment folders left behind by an interrupted build
+def _remove_orphans(index_dir, manifest):
+    listed = {segment["name"] for segment in manifest["segments"]}
+    for name in os.listdir(index_dir):
+        if name.startswith("seg-") and name not in listed:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+# Add source files to the index, only indexing files that are new
+def build(sources, index_dir=DEFAULT_INDEX_DIR, rebuild=False):
+    os.makedirs(index_dir, exist_ok=True)
+    manifest = load_manifest(index_dir)
+    _remove_orphans(index_dir, manifest)
+    known = manifest["sources"]
+    sources = [os.path.abspath(path) for path in sources]
+
+    # A changed or deleted source can't be removed from a segment, so start over
+    changed = [path for path, fp in known.items()
+               if not os.path.exists(path) or _fingerprint(path) != fp]
+    missing = [segment["name"] for segment in manifest["segments"]
+               if not os.path.isdir(os.path.join(index_dir, segment["name"]))]
+    old_segments = []
+    if rebuild or manifest.get("version") != VERSION or changed or missing:
+        if changed:
+            print(f"{len(changed)} indexed source(s) changed, rebuilding the index.")
+        if missing:
+            print(f"{len(missing)} segment(s) are missing, rebuilding the index.")
+        sources = sorted(set(sources) | {path for path in known if os.path.exists(path)})
+        # Old segments stay on disk until the new manifest is saved
+        old_segments = manifest["segments"]
+        manifest = {"version": VERSION, "segments": [], "sources": {}}
+
+    new_sources = [path for path in sources if path not in manifest["sources"]]
+    if not new_sources and not old_segments:
+        print("Index is already up to date.")
+        return manifest
+
+    # New segment names never reuse an old one, even during a rebuild
+    next_id = max((int(s["name"].split("-")[1]) for s in manifest["segments"] + old_segments),
+                  default=-1) + 1
+    writer = None
+    for path in new_sources:
+        print(f"Indexing {path}...")
+        for title, text in read_source(path):
+            if writer is None:
+                writer = SegmentWriter(os.path.join(index_dir, f"seg-{next_id:05d}"))
+                next_id += 1
+            writer.add(title, text)
+            if len(writer) >= SEGMENT_SIZE:
+                manifest["segments"].append(writer.close())
+                writer = None
+        manifest["sources"][path] = _fingerprint(path)
+    if writer is not None:
+        manifest["segments"].append(writer.close())
+
+    save_manifest(index_dir, manifest)
+    for segment in old_segments:
+        shutil.rmtree(os.path.join(index_dir, segment["name"]), ignore_errors=True)
+    total = sum(segment["docs"] for segment in manifest["segments"])
+    print(f"Done. The index holds {total} documents in {len(manifest['segments'])} segment(s).")
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Searching
+# ---------------------------------------------------------------------------
+
+# One memory-mapped segment of the index
+class Segment:
+    def __init__(self, path):
+        self._maps = []
+        self._views = []
+        self.terms = self._open(path, "terms.bin")
+        self.term_offsets = self._open(path, "term_offsets.bin", "Q")
+        self.posting_offsets = self._open(path, "posting_offsets.bin", "Q")
+        self.postings = self._open(path, "postings.bin", "I")
+        self.documents = self._open(path, "documents.bin")
+        self.doc_offsets = self._open(path, "doc_offsets.bin", "Q")
+        self.doc_lengths = self._open(path, "doc_lengths.bin", "I")
+        self.term_count = len(self.term_offsets) - 1
+
+    def _open(self, path, name, typecode=None):
+        mapped, view = _map(os.path.join(path, name))
+        self._maps.append(mapped)
+        self._views.append(view)
+        if typecode:
+            view = view.cast(typecode)  # Read the bytes as an array of numbers
+            self._views.append(view)
+        return view
+
+    def _term(self, i):
+        return bytes(self.terms[self.term_offsets[i]:self.term_offsets[i + 1]])
+
+    # Binary search the sorted term list, returns the postings as a flat (doc, tf) view
+    def lookup(self, term):
+        encoded = term.encode("utf-8")
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.term_count and self._term(lo) == encoded:
+            return self.postings[2 * self.posting_offsets[lo]:2 * self.posting_offsets[lo + 1]]
+        return None
+
+    def document(self, doc_id):
+        record = bytes(self.documents[self.doc_offsets[doc_id]:self.doc_offsets[doc_id + 1]])
+        title, text = record.decode("utf-8").split("\t", 1)
+        return title, text
+
+    def close(self):
+        # Views must be released before the maps underneath them can be closed
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            if mapped is not None:
+                mapped.close()
+        self._views = []
+        self._maps = []
+
+
+# Read-only view of the whole index, searched with BM25
+class KnowledgeIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        manifest = load_manifest(index_dir)
+        self.segments = [Segment(os.path.join(index_dir, s["name"])) for s in manifest["segments"]]
+        self.doc_count = sum(s["docs"] for s in manifest["segments"])
+        tokens = sum(s["tokens"] for s in manifest["segments"])
+        self.avg_length = tokens / self.doc_count if self.doc_count else 0.0
+
+    # Open the index if it has been built, otherwise return None.
+    # A damaged index never stops the assistant, it just falls back to Wikipedia.
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR):
+        if not os.path.exists(os.path.join(index_dir, MANIFEST)):
+            return None
+        try:
+            index = cls(index_dir)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return index if index.doc_count else None
+
+    # Return up to k (score, matched terms, title, text) results, best first
+    def search(self, query, k=5):
+        terms = list(dict.fromkeys(tokenize(query)))  # Unique terms, in order
+        if not terms or not self.doc_count:
+            return []
+        found = [[segment.lookup(term) for term in terms] for segment in self.segments]
+        scores = {}
+        matched = {}     # (segment, doc id) -> bit set of the terms it was scored for
+        pruned = set()   # (segment, term) pairs whose postings were cut short
+        for i, term in enumerate(terms):
+            # Document frequency counts every segment, so scores are comparable
+            df = sum(len(postings[i]) // 2 for postings in found if postings[i] is not None)
+            if not df:
+                continue
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            for s, segment in enumerate(self.segments):
+                postings = found[s][i]
+                if postings is None:
+                    continue
+                # Each segment reads its share of the term's budget, best postings first
+                segment_df = len(postings) // 2
+                take = min(segment_df, math.ceil(MAX_POSTINGS * segment_df / df))
+                if take < segment_df:
+                    pruned.add((s, i))
+                lengths = segment.doc_lengths
+                for j in range(0, 2 * take, 2):
+                    doc_id, tf = postings[j], postings[j + 1]
+                    norm = K1 * (1 - B + B * lengths[doc_id] / self.avg_length)
+                    key = (s, doc_id)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                    matched[key] = matched.get(key, 0) | 1 << i
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        results = []
+        for (s, doc_id), score in best:
+            # A common word may be in the document beyond the part that was read,
+            # so check the full postings before counting it as missing
+            terms_found = matched[(s, doc_id)]
+            for i in range(len(terms)):
+                if not terms_found >> i & 1 and (s, i) in pruned and _has_doc(found[s][i], doc_id):
+                    terms_found |= 1 << i
+            title, text = self.segments[s].document(doc_id)
+            results.append((score, bin(terms_found).count("1"), title, text))
+        return results
+
+    # Short spoken answer for a question, or None if nothing relevant is indexed
+    def answer(self, query, sentences=2):
+        terms = set(tokenize(query))
+        results = self.search(query, k=1)
+        # Short questions must match every word, longer ones at least half of them,
+        # so a page sharing a single word with the question isn't read out
+        needed = len(terms) if len(terms) <= 2 else (len(terms) + 1) // 2
+        if not results or results[0][1] < needed:
+            return None
+        return first_sentences(results[0][3], sentences)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+# ---------------------------------------------------------------------------
+# Command line tool
+# ---------------------------------------------------------------------------
+
+# Time a set of queries the way the assistant runs them and print latency percentiles
+def benchmark(index, queries, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.answer(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    if not timings:
+        print("No queries to run.")
+        return
+    timings.sort()
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    print(f"{len(timings)} queries over {index.doc_count} documents")
+    print(f"mean {sum(timings) / len(timings):.2f} ms, p50 {percentile(0.50):.2f} ms, "
+          f"p95 {percentile(0.95):.2f} ms, max {timings[-1]:.2f} ms")
+
+
+# Build question-like benchmark queries from random runs of words in the documents.
+# Titles alone are mostly rare words and make the index look faster than it is.
+def sample_queries(index, count):
+    picks = []
+    for _ in range(count * 5):
+        if len(picks) >= count:
+            break
+        segment = random.choice(index.segments)
+        title, text = segment.document(random.randrange(len(segment.doc_lengths)))
+        words = (text or title).split()
+        size = random.randint(3, 8)
+        start = random.randrange(max(1, len(words) - size + 1))
+        query = " ".join(words[start:start + size])
+        if tokenize(query):
+            picks.append(query)
+    return picks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline knowledge index for the voice assistant.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR, help="index folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = commands.add_parser("build", help="add source files to the index")
+    build_cmd.add_argument("sources", nargs="+", help="abstracts dump (.xml/.xml.gz) or text files")
+    build_cmd.add_argument("--rebuild", action="store_true", help="rebuild the index from scratch")
+
+    query_cmd = commands.add_parser("query", help="search the index")
+    query_cmd.add_argument("text", help="question or keywords")
+    query_cmd.add_argument("-k", type=int, default=5, help="number of results")
+
+    bench_cmd = commands.add_parser("bench", help="measure query latency")
+    bench_cmd.add_argument("--queries", help="file with one query per line")
+    bench_cmd.add_argument("-n", type=int, default=200, help="number of sampled queries")
+    bench_cmd.add_argument("--repeat", type=int, default=3, help="times to run each query")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build(args.sources, args.index, rebuild=args.rebuild)
+        return 0
+
+    index = KnowledgeIndex.load(args.index)
+    if index is None:
+        print(f"No index found in '{args.index}'. Run the build command first.")
+        return 1
+    if args.command == "query":
+        for score, _, title, text in index.search(args.text, k=args.k):
+            print(f"{score:7.2f}  {title}: {first_sentences(text, 1)}")
+    else:
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = sample_queries(index, args.n)
+        benchmark(index, queries, args.repeat)
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# test_knowledge_index.py
+# Tests for the offline knowledge index. Run from the repository root with:
+#   python -m pytest "Task 1 - Voice Assistant"
+# (inside this folder, code.py hides the standard library "code" module pytest needs)
+
+import os
+import gzip
+
+import pytest
+
+import knowledge_index
+from knowledge_index import KnowledgeIndex, build
+
+ABSTRACTS = """<feed>
+<doc><title>Wikipedia: Telephone</title><url>https://en.wikipedia.org/wiki/Telephone</url>
+<abstract>A telephone is a device for talking at a distance. Alexander Graham Bell patented it in 1876. It changed the world.</abstract></doc>
+<doc><title>Wikipedia: Albert Einstein</title><url>https://en.wikipedia.org/wiki/Albert_Einstein</url>
+<abstract>Albert Einstein was a German-born theoretical physicist. He developed the theory of relativity.</abstract></doc>
+</feed>
+"""
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def abstracts(tmp_path):
+    return write(tmp_path / "abstracts.xml", ABSTRACTS)
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path / "index")
+
+
+# Search the index once and close it again
+def answer(index_dir, question):
+    index = KnowledgeIndex.load(index_dir)
+    try:
+        return index.answer(question)
+    finally:
+        index.close()
+
+
+def test_build_then_query(abstracts, index_dir):
+    build([abstracts], index_dir)
+    index = KnowledgeIndex.load(index_dir)
+    assert index.doc_count == 2
+    assert index.search("telephone")[0][2] == "Telephone"
+    assert index.answer("tell me about the telephone") == (
+        "A telephone is a device for talking at a distance. Alexander Graham Bell patented it in 1876.")
+    assert index.answer("quantum chromodynamics") is None
+    index.close()
+
+
+def test_compressed_dump(tmp_path, index_dir):
+    path = str(tmp_path / "abstracts.xml.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(ABSTRACTS)
+    assert [title for title, _ in knowledge_index.read_source(path)] == ["Telephone", "Albert Einstein"]
+
+
+def test_short_questions_need_every_word(abstracts, index_dir):
+    build([abstracts], index_dir)
+    assert answer(index_dir, "einstein relativity") is not None
+    assert answer(index_dir, "einstein france") is None
+
+
+def test_contractions(abstracts, index_dir):
+    build([abstracts], index_dir)
+    assert knowledge_index.tokenize("What's Einstein's theory?") == ["einstein", "theory"]
+    assert answer(index_dir, "what's relativity") == answer(index_dir, "what is relativity") is not None
+    assert answer(index_dir, "who’s albert einstein") is not None
+
+
+def test_incremental_build(abstracts, tmp_path, index_dir, capsys):
+    build([abstracts], index_dir)
+    notes = write(tmp_path / "notes.txt", "Python\tPython is a programming language. It is popular.\n")
+    manifest = build([notes], index_dir)
+    assert len(manifest["segments"]) == 2
+    assert answer(index_dir, "what is python") == "Python is a programming language. It is popular."
+    assert answer(index_dir, "albert einstein") is not None
+
+    build([abstracts, notes], index_dir)
+    assert "already up to date" in capsys.readouterr().out
+
+
+def test_rebuild_when_source_changes(abstracts, tmp_path, index_dir):
+    notes = write(tmp_path / "notes.txt", "Python\tPython is a snake.\n")
+    build([abstracts], index_dir)
+    build([notes], index_dir)
+    write(notes, "Python\tPython is a programming language.\n")
+    manifest = build([], index_dir)
+    assert len(manifest["segments"]) == 1
+    assert sorted(os.listdir(index_dir)) == ["manifest.json", manifest["segments"][0]["name"]]
+    assert answer(index_dir, "python language") == "Python is a programming language."
+    assert answer(index_dir, "python snake") is None
+    assert answer(index_dir, "albert einstein") is not None
+
+
+def test_titleless_corpus(tmp_path, index_dir, capsys):
+    corpus = write(tmp_path / "corpus.txt", "Cats are small furry animals.\nDogs bark at night.\n")
+    build([corpus], index_dir)
+    index = KnowledgeIndex.load(index_dir)
+    assert index.answer("furry cats") == "Cats are small furry animals."
+    queries = knowledge_index.sample_queries(index, 5)
+    assert queries
+    knowledge_index.benchmark(index, queries, repeat=1)
+    knowledge_index.benchmark(index, [], repeat=1)
+    assert "No queries to run." in capsys.readouterr().out
+    index.close()
+
+
+def test_empty_corpus(tmp_path, index_dir):
+    build([write(tmp_path / "empty.txt", "")], index_dir)
+    assert KnowledgeIndex.load(index_dir) is None
+
+
+def test_damaged_index_is_ignored(abstracts, index_dir):
+    manifest = build([abstracts], index_dir)
+    lengths = os.path.join(index_dir, manifest["segments"][0]["name"], "doc_lengths.bin")
+    with open(lengths, "r+b") as f:
+        f.truncate(3)  # No longer a whole number of integers
+    assert KnowledgeIndex.load(index_dir) is None
+
+    write(os.path.join(index_dir, "manifest.json"), "{bad")
+    assert KnowledgeIndex.load(index_dir) is None
+
+
+def test_pruning_keeps_rare_terms(tmp_path, index_dir, monkeypatch):
+    lines = [f"common words filler {i}" for i in range(50)] + ["Zebra\tcommon zebra stripes"]
+    build([write(tmp_path / "corpus.txt", "\n".join(lines))], index_dir)
+    monkeypatch.setattr(knowledge_index, "MAX_POSTINGS", 3)
+    index = KnowledgeIndex.load(index_dir)
+    assert index.search("common zebra")[0][2] == "Zebra"
+    assert index.answer("common zebra") == "common zebra stripes"
+    assert len(index.search("common", k=10)) == 3
+    index.close()
+
+
+# Stand-in for read_source that stops with Ctrl-C after a few documents
+def interrupted(path):
+    for i in range(3):
+        yield f"Doc {i}", f"Document number {i}."
+    raise KeyboardInterrupt
+
+
+def test_recovers_from_interrupted_build(abstracts, tmp_path, index_dir, monkeypatch):
+    build([abstracts], index_dir)
+    notes = write(tmp_path / "notes.txt", "Python\tPython is a programming language.\n")
+    monkeypatch.setattr(knowledge_index, "SEGMENT_SIZE", 2)
+    monkeypatch.setattr(knowledge_index, "read_source", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        build([notes], index_dir)
+    monkeypatch.undo()
+
+    assert answer(index_dir, "albert einstein") is not None
+    manifest = build([notes], index_dir)
+    assert len(manifest["segments"]) == 2
+    assert sorted(os.listdir(index_dir)) == sorted(
+        ["manifest.json"] + [segment["name"] for segment in manifest["segments"]])
+    assert answer(index_dir, "python language") is not None
+
+
+def test_interrupted_rebuild_keeps_old_index(abstracts, index_dir, monkeypatch, capsys):
+    build([abstracts], index_dir)
+    monkeypatch.setattr(knowledge_index, "read_source", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        build([abstracts], index_dir, rebuild=True)
+    monkeypatch.undo()
+
+    assert answer(index_dir, "albert einstein") is not None
+    build([abstracts], index_dir)
+    assert "already up to date" in capsys.readouterr().out
+    assert answer(index_dir, "albert einstein") is not None
+
+
+def test_rebuild_when_segment_missing(abstracts, index_dir):
+    manifest = build([abstracts], index_dir)
+    name = manifest["segments"][0]["name"]
+    os.rename(os.path.join(index_dir, name), os.path.join(index_dir, "gone"))
+    assert KnowledgeIndex.load(index_dir) is None
+    build([abstracts], index_dir)
+    assert answer(index_dir, "albert einstein") is not None